@@ -14,7 +14,6 @@ Modified by: Bryce Haley, Laura Gutierrez Funderburk
 2020
 """
 import numpy as np
-from scipy.spatial.distance import pdist, squareform, cdist
 
 import matplotlib
 import matplotlib.pyplot as plt
@@ -22,7 +21,6 @@ from matplotlib.patches import Patch
 import scipy.integrate as integrate
 import matplotlib.animation as animation
 from IPython.display import HTML
-import pandas as pd
 
 import scripts
 
@@ -52,12 +50,17 @@ class ParticleBox:
                  tide_movement_up = True,
                  end = False,
                  frozen_iter = 0):
-        self.init_state = np.asarray(init_state, dtype=float)
-        self.init_tide_state = np.asarray(init_tide_state, dtype=float)
-        self.init_perimeter = np.asarray(init_perimeter, dtype=float)
-        self.M = M * np.ones(self.init_state.shape[0])
-        self.size = size
-        self.state = self.init_state.copy()
+        # float32 is plenty for positions in [-2, 2] and halves the memory traffic of step
+        self.init_state = np.asarray(init_state, dtype=np.float32)
+        self.init_tide_state = np.asarray(init_tide_state, dtype=np.float32)
+        self.init_perimeter = np.asarray(init_perimeter, dtype=np.float32)
+        self.M = M * np.ones(self.init_state.shape[0], dtype=np.float32)
+        self.size = float(size)
+        # positions and velocities are stored as separate contiguous arrays
+        self.x = self.init_state[:, 0].copy()
+        self.y = self.init_state[:, 1].copy()
+        self.vx = self.init_state[:, 2].copy()
+        self.vy = self.init_state[:, 3].copy()
         self.tide_state = self.init_tide_state.copy()
         self.perimeter = self.init_perimeter.copy()
         self.time_elapsed = 0
@@ -65,7 +68,17 @@ class ParticleBox:
         self.tide_movement_up = tide_movement_up
         self.end = end
         self.frozen_iter = frozen_iter
-        
+        # perimeter points as an (n, 2) array and the squared fish size, used to check for fish hitting the trap
+        self._perim_xy = np.ascontiguousarray(np.stack([self.perimeter[0], self.perimeter[1]], axis=1))
+        self._size2 = self.size * self.size
+
+    @property
+    def state(self):
+        """a read-only snapshot of the current [N x 4] array of positions and velocities, in the same layout as init_state.
+        To change the simulation, write to x, y, vx and vy instead."""
+        state = np.column_stack((self.x, self.y, self.vx, self.vy))
+        state.setflags(write=False)
+        return state
 
     def step(self, dt):
         """step once by dt seconds"""
@@ -75,32 +88,34 @@ class ParticleBox:
         self.time_elapsed += dt
         if not self.end:
             # update positions
-            self.state[:, :2] += dt * self.state[:, 2:]
+            self.x += dt * self.vx
+            self.y += dt * self.vy
         
             #check for fish hitting the trap
-            dist_arr = cdist(self.state[:,:2], np.array(list(zip(self.perimeter[0], self.perimeter[1]))))
-            hit_trap = (dist_arr.min(axis=1) < self.size)
-            for i in range(0, len(dist_arr)):
-                if(self.perimeter[1,i]<self.bounds[3] - 1):
-                    hit_trap[i] = False
-            self.state[hit_trap, 2:] *= -1
+            # compare squared distances so no square root is needed
+            dx = self.x[:, None] - self._perim_xy[None, :, 0]
+            dy = self.y[:, None] - self._perim_xy[None, :, 1]
+            hit_trap = (dx*dx + dy*dy).min(axis=1) < self._size2
+            n = len(hit_trap)
+            hit_trap[self.perimeter[1, :n] < self.bounds[3] - 1] = False
+            self.vx[hit_trap] *= -1
+            self.vy[hit_trap] *= -1
         
         
             # check for crossing boundary
-            crossed_x1 = (self.state[:, 0] < self.bounds[0] + self.size)
-            crossed_x2 = (self.state[:, 0] > self.bounds[1] - self.size)
-            crossed_y1 = (self.state[:, 1] < self.bounds[2] + self.size)
-            crossed_y2 = (self.state[:, 1] > self.bounds[3] - self.size)
-
-            self.state[crossed_x1, 0] = self.bounds[1] - self.size
-            self.state[crossed_x2, 0] = self.bounds[0] + self.size
-
-            self.state[crossed_y1, 1] = self.bounds[2] + self.size
-            self.state[crossed_y2, 1] = self.bounds[3] - self.size
-
-            #self.state[crossed_x1 | crossed_x2, 2] *= -1
-            self.state[crossed_y1 | crossed_y2, 3] *= -1
-            self.state[crossed_y1, 0] *= -1
+            x = self.x
+            y = self.y
+            x_min, x_max = self.bounds[0] + self.size, self.bounds[1] - self.size
+            y_min, y_max = self.bounds[2] + self.size, self.bounds[3] - self.size
+            crossed_y1 = (y < y_min)
+            crossed_y = crossed_y1 | (y > y_max)
+
+            # fish crossing one side in x come back on the other side
+            x[:] = np.where(x < x_min, x_max, np.where(x > x_max, x_min, x))
+            np.clip(y, y_min, y_max, out=y)
+
+            self.vy[crossed_y] *= -1
+            x[crossed_y1] *= -1
         
             #moving boundary to show tidal movement
             if self.tide_movement_up:
@@ -119,67 +134,69 @@ class ParticleBox:
         
 def init():
     """initialize animation"""
-    global box, rect
+    global box, rect, _MS, _tide_level
+    # marker size of the fish, the figure is not resized during the animation
+    x_min, x_max = ax.get_xbound()
+    _MS = int(fig.dpi * 2 * box.size * fig.get_figwidth() / (x_max - x_min))
+    # tide level last drawn, the tide and the trap are only redrawn when it moves
+    _tide_level = None
     free_fish.set_data([], [])
+    free_fish.set_markersize(_MS)
     tide.set_data([], [])
     #perimeter.set_data([],[])
-    rect.set_edgecolor('none')
+    # the box edge never changes so it is drawn once as part of the background
+    rect.set_edgecolor('k')
     trapped_fish.set_data([], [])
-    return free_fish, tide, rect, trapped_fish
+    trapped_fish.set_markersize(_MS)
+    return free_fish, tide, trapped_fish
 
 def animate(i):
     """perform animation step"""
-    global box, rect, dt, ax, fig
+    global box, rect, dt, ax, fig, _tide_level
     box.step(dt)
-
-    ms = int(fig.dpi * 2 * box.size * fig.get_figwidth()
-             / np.diff(ax.get_xbound())[0])
-    
-    # update pieces of the animation
-    rect.set_edgecolor('k')
+    tide_level = box.bounds[3]
     
-    # update high tide line
-    tide.set_data(box.tide_state)
-    
-    # update the trap showing above water
-    # perimiter referes to the perimeter of the trap
-    perimeter_arr = box.perimeter.copy()
-    mask  = perimeter_arr[1] >= box.bounds[3] - 1
+    # update pieces of the animation that move with the tide
+    if tide_level != _tide_level:
+        _tide_level = tide_level
 
-    perimeter_arr = np.array([perimeter_arr[0][mask], perimeter_arr[1][mask]])
+        # update high tide line
+        tide.set_data(box.tide_state)
 
-    perimeter_arr = np.array([np.array_split(perimeter_arr[0], 2), np.array_split(perimeter_arr[1], 2)])
-    
-    left_perimeter = perimeter_arr[:,0]
-    right_perimeter = perimeter_arr[:,1]
+        # update the trap showing above water
+        # perimiter referes to the perimeter of the trap
+        perimeter_arr = box.perimeter.copy()
+        mask  = perimeter_arr[1] >= tide_level - 1
+
+        perimeter_arr = np.array([perimeter_arr[0][mask], perimeter_arr[1][mask]])
+
+        perimeter_arr = np.array([np.array_split(perimeter_arr[0], 2), np.array_split(perimeter_arr[1], 2)])
 
-    perimeter_right.set_data(right_perimeter)
-    perimeter_left.set_data(left_perimeter)
+        left_perimeter = perimeter_arr[:,0]
+        right_perimeter = perimeter_arr[:,1]
+
+        perimeter_right.set_data(right_perimeter)
+        perimeter_left.set_data(left_perimeter)
+
+        #update patches (beach and water)
+        beach.set_bounds(-2, tide_level, 4, 2-tide_level)
+        water.set_bounds(-2, -2, 4, 2+tide_level)
     
     #update the fishs
-    x = box.state[:, 0]
-    y = box.state[:, 1]
-    
-    df = pd.DataFrame({'x':x, 'y':y})
-    in_df = df[df[['x', 'y']].apply(lambda row : row['x']**2 + row['y']** 2 <= 1 and row['y'] <= 0, axis=1)]
-    out_df = df[df[['x','y']].apply(lambda row : row['x']**2 + row['y']**2 > 1 or row['y'] > 0, axis=1)]
+    x = box.x
+    y = box.y
+    in_trap = (x**2 + y**2 <= 1) & (y <= 0)
 
-    free_fish.set_data(np.array(out_df.x), np.array(out_df.y))
-    free_fish.set_markersize(ms)
+    free_fish.set_data(x[~in_trap], y[~in_trap])
     
     #let animation freeze after trap is closed
     if box.frozen_iter < 99:
-        trapped_fish.set_data(np.array(in_df.x), np.array(in_df.y))
+        trapped_fish.set_data(x[in_trap], y[in_trap])
     # remove caught fish from the trap
     else:
         trapped_fish.set_data([],[])
-    trapped_fish.set_markersize(ms)
-    
-    #update patches (beach and water)
-    beach.set_bounds(-2, box.bounds[3], 4, 2-box.bounds[3])
-    water.set_bounds(-2, -2, 4, 2+box.bounds[3])
 
-    return free_fish, tide, rect, trapped_fish, perimeter_left, perimeter_right, beach, water
+    return free_fish, tide, trapped_fish, perimeter_left, perimeter_right, beach, water
 
 if __name__ == "__main__":
 
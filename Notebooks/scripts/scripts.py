@@ -14,6 +14,7 @@ import matplotlib.pyplot as plt
 import seaborn
 import os,sys
 import math
+import functools
 from typing import List, Tuple
 import plotly.express as px
 import folium
@@ -23,6 +24,33 @@ import ipywidgets as widgets
 from ipywidgets import interact, interact_manual, widgets, Layout, VBox, HBox, Button,fixed,interactive
 from IPython.display import display, Javascript, Markdown, HTML, clear_output
 
+__all__ = ['default_slope', 'default_inter', 'default_radius', 'default_height', 'default_delta', 'max_fish',
+           'get_tide_values', 'print_tide_data', 'create_tide_plot',
+           'get_first_underwater_index', 'get_ratio_of_perimeter_covered',
+           'get_ratios_vectorized', 'get_coverage_lookup', 'get_ratios_sweep', 'get_perimeter',
+           'run_trap_harvesting', 'TrapSimulation', 'run_trap', 'run_trap_sweep',
+           'generate_df_from_simulation', 'plot_values', 'plot_caught_fish', 'plot_trap', 'plot_interactive_map',
+           'create_tide_plot_grade6', 'create_3d_trap', 'run_model_grade6', 'run_ui_updated', 'draw_results']
+
+try:
+    from numba import njit, prange, guvectorize, vectorize
+    has_numba = True
+except ImportError:
+    # numba is optional, without it the model loops run as plain python
+    has_numba = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+try:
+    import numexpr as ne
+except ImportError:
+    # numexpr is optional, it is only used to fuse the array expressions of parameter sweeps
+    ne = None
+
 
 # global variables that act as default values for the trap inputs
 default_slope = 0.17
@@ -31,23 +59,70 @@ default_radius = 25
 default_height = 2
 default_delta = 5
 max_fish = 1000
+# ratio of a right angle covered by an angle in radians, hoisted out of the coverage math
+inv_half_pi = 2.0 / math.pi
+# number of points per trace above which plots are down-sampled when plotly_resampler is installed
+max_plot_points = 2000
+# angles of the 100 points sampled along the semi-circular trap, and their cos and sin, shared by every perimeter
+_theta = np.linspace(0, np.pi, 100)
+_cos_theta = np.cos(_theta)
+_sin_theta = np.sin(_theta)
+_theta.setflags(write=False)
+_cos_theta.setflags(write=False)
+_sin_theta.setflags(write=False)
+
+@functools.lru_cache(maxsize=1)
+def _load_tide_values():
+    """Reads the tide values measured for one week in comox. The result is cached so the csv is only read once."""
+
+    tide_path = os.path.join('resources', 'comox_tide.csv')
+    # each row is one day, a PDT date followed by 24 hourly values, the date column is skipped while parsing
+    tide_values = np.loadtxt(tide_path, delimiter=',', skiprows=1, usecols=range(1, 25), dtype=np.float64).ravel()
+    tide_values.setflags(write=False)
+    return tide_values
 
 def get_tide_values():
     """Grabs the tide values measured for one week in comox
     Returns:
-        a listcontaining measured tide values for comox"""
+        a read-only array containing measured tide values for comox"""
 
-    tide_path = os.path.join('resources', 'comox_tide.csv')
-    tide_df = pd.read_csv(tide_path)
-    tide_df = tide_df.drop(columns = ['PDT'])
-    return tide_df.values.flatten()
+    return _load_tide_values()
 
 
 def print_tide_data(tide_values):
-        result_min = np.where(tide_values == min(tide_values))
-        result_max = np.where(tide_values == max(tide_values))
-        print("The lowest tide reaches", min(tide_values)[0],"meters on day",result_min[0][0]//24,"at",result_min[0][0]%24,"hours")
-        print("The highest tide reaches",max(tide_values)[0],"meters on day",result_min[0][0]//24,"at",result_max[0][0]%24,"hours")
+    tide_values = np.asarray(tide_values).ravel()
+    index_min = tide_values.argmin()
+    index_max = tide_values.argmax()
+    day_min, hour_min = divmod(index_min, 24)
+    day_max, hour_max = divmod(index_max, 24)
+    print("The lowest tide reaches", tide_values[index_min],"meters on day",day_min,"at",hour_min,"hours")
+    print("The highest tide reaches",tide_values[index_max],"meters on day",day_max,"at",hour_max,"hours")
+
+def _get_day_hour_text(day, day_hour):
+    """Creates the hover text showing the day and the hour of the day of each point in a plot
+    Args:
+        day: an array with the day of each point
+        day_hour: an array with the hour of the day of each point
+    Returns:
+        an array of strings, built with one vectorized string concatenation"""
+
+    day = pd.Series(day).astype(str)
+    day_hour = pd.Series(day_hour).astype(str)
+    return ('<b>Day</b>: ' + day + '<br><b>Hour</b>: ' + day_hour).to_numpy()
+
+def _resample_figure(fig, n_points):
+    """Wraps fig in a plotly_resampler FigureResampler, which sends the browser a down-sampled view of each trace,
+    when its traces have more than max_plot_points points and plotly_resampler is installed.
+    Otherwise returns fig unchanged."""
+    if(n_points > max_plot_points):
+        try:
+            # imported only when needed, plotly_resampler pulls in dash
+            from plotly_resampler import FigureResampler
+        except ImportError:
+            # plotly_resampler is optional, without it long series are plotted with every point
+            return fig
+        return FigureResampler(fig)
+    return fig
 
 def create_tide_plot(timeframe="week", day=1):
     """Displays a plot of hourly tide levels for 1 week in May using readings from comox
@@ -67,11 +142,10 @@ def create_tide_plot(timeframe="week", day=1):
     Raises: ValueError if options not entered correctly
     """
 
-    tide_df = pd.DataFrame(get_tide_values())
-    tide_df = tide_df.rename(columns = {0:'tide_level'})
-    tide_df['hour'] = tide_df.index
-    tide_df["day_hour"] = tide_df["hour"] % 24
-    tide_df["day"] = tide_df['hour'] // 24
+    # the plots only need the tide values and their hours, so they are built from arrays without a DataFrame
+    tide_level = get_tide_values()
+    hour = np.arange(len(tide_level))
+    day_of_hour, day_hour = np.divmod(hour, 24)
     try:
         timeframe = timeframe.lower()
         day = round(day)
@@ -79,34 +153,53 @@ def create_tide_plot(timeframe="week", day=1):
         raise ValueError("kwarg 'timeframe' must be 'day' or 'week'.\n kwarg 'day' must be  between 0-6")
 
     if(timeframe == "week"):
-        fig = px.line(tide_df, x="hour", y="tide_level", line_shape='spline')
-        fig.update_traces(text= [f'<b>Day</b>: {x}<br><b>Hour</b>: {y}' for x,y in list(zip(tide_df['day'].values, tide_df['day_hour'].values))],
+        days = np.arange(len(tide_level) // 24)
+        fig = px.line(x=hour, y=tide_level, labels={'x': 'hour', 'y': 'tide_level'}, line_shape='spline')
+        fig.update_traces(text= _get_day_hour_text(day_of_hour, day_hour),
                         hovertemplate='%{text}<br>%{y:}m above sea-level')
         fig.update_layout(title='Measured Tide Readings for Comox Harbour',
                     xaxis_title = 'Time (Days Since Start)',
                     yaxis_title = 'Tide Level (Meters Above Sea Level)',
-                    xaxis = dict(tickvals = tide_df.day.unique() * 24,
-                                    ticktext = tide_df.day.unique()))
+                    xaxis = dict(tickvals = days * 24,
+                                    ticktext = days))
+        fig = _resample_figure(fig, len(tide_level))
 
     elif(timeframe == "day" and 0 <= day and 6 >= day):
-        tide_df = tide_df[tide_df.day == day]
-        fig = px.line(tide_df, x="day_hour", y="tide_level", line_shape='spline')
+        # the hours of the selected day are a contiguous slice of the week
+        hours = slice(day * 24, (day + 1) * 24)
+        fig = px.line(x=day_hour[hours], y=tide_level[hours], labels={'x': 'day_hour', 'y': 'tide_level'}, line_shape='spline')
         fig.update_layout(title='Measured Tide Readings for Comox Harbour',
                     xaxis_title = 'Time (Hours)',
                     yaxis_title = 'Tide Level (Meters Above Sea Level)')
-        fig.update_traces(text= [f'<b>Day</b>: {x}<br><b>Hour</b>: {y}' for x,y in list(zip(tide_df['day'].values, tide_df['day_hour'].values))],
+        fig.update_traces(text= _get_day_hour_text(day_of_hour[hours], day_hour[hours]),
                         hovertemplate='%{text}<br>%{y:}m above sea-level')
     else:
         raise ValueError("kwarg 'timeframe' must be 'day' or 'week'.\n kwarg 'day' must be  between 0-6")
 
     return fig
 
+def get_first_underwater_index(tide_level, z_values):
+    """Finds the first point on the perimeter that is under water
+
+    Args:
+        tide_level: a tide level reading, or an array of readings, in meters above sea-level
+        z_values: the heights of the points on the perimeter of the trap
+
+    Returns:
+        the index of the first point with a height at or below the tide level, one per tide level.
+        If no point is under water the index is len(z_values).
+    """
+    # the running minimum of z never increases, so the first point underwater is where the running minimum
+    # first reaches the tide level. Reversed it is sorted which allows a binary search instead of a scan
+    z_running_min = np.minimum.accumulate(np.asarray(z_values, dtype=np.float64))[::-1]
+    return len(z_running_min) - np.searchsorted(z_running_min, tide_level, side='right')
+
 def get_ratio_of_perimeter_covered(tide_level, perimeter,  radius=  25, delta= 5):
     """Given a tide level and points on the perimeter of a semi-circular trap gives the ratio of the trap under water
 
     Args:
         tide_level: A tide level reading in meters above sea-level
-        perimeter: a list of (x,y,z) floats descriping the top of the semi-circular trap ordered in increasing x values
+        perimeter: a (3, n) array of (x,y,z) floats descriping the top of the semi-circular trap ordered in increasing x values
         radius: the radius of the semi-circular trap created
         delta: how far down the y axis the "center" of the semi-circle is from the origin
 
@@ -116,31 +209,146 @@ def get_ratio_of_perimeter_covered(tide_level, perimeter,  radius=  25, delta= 5
     """
     x_values = perimeter[0]
     y_values = perimeter[1]
-    z_values = perimeter[2]
-
-    # iterated throught the z values to find the first value underwater
-    index = -1
-    for i in range(len(z_values)):
-        if(z_values[i] <= tide_level):
-            index = i
-            break;
+
+    # find the first value underwater
+    index = get_first_underwater_index(tide_level, perimeter[2])
     #if no point is underwater then return a 0 ratio underwater
-    if(index == -1):
+    if(index == len(perimeter[2])):
         return 0
     
     #record the x and y values for the "first" underwater point
-    x = x_values[index]
-    y = y_values[index]
+    x = float(x_values[index])
+    y = float(y_values[index])
 
-    #find the lenth of the chord whos endpoints are (0,1) and (x,y)
-    length = np.sqrt((x)**2 + (y - radius - delta)**2)
+    #find the squared lenth of the chord whos endpoints are (0,1) and (x,y), only the square is needed below
+    length_sq = x*x + (y - radius - delta)**2
+    two_r_sq = 2 * radius * radius
     
     #find the angle between (0,1) and (x,y) using the length of the three sides of the triangle then divide that by a half pi
     #this ratio is the ratio of the trap that is underwater
-    angle = math.acos((2 * radius**2 - length**2) / (2 * radius**2))
-    coverage  = angle/ (0.5 * np.pi)
+    angle = math.acos((two_r_sq - length_sq) / two_r_sq)
+    coverage  = angle * inv_half_pi
     return coverage
 
+def get_ratios_vectorized(tide_values, perimeter, radius= default_radius, delta= default_delta):
+    """Vectorized version of get_ratio_of_perimeter_covered for a whole series of tide levels
+
+    Args:
+        tide_values: an array of tide level readings in meters above sea-level
+        perimeter: a (3, n) array of (x,y,z) floats descriping the top of the semi-circular trap ordered in increasing x values
+        radius: the radius of the semi-circular trap created
+        delta: how far down the y axis the "center" of the semi-circle is from the origin
+
+    Returns:
+        an array of floats in [0,1], one per tide level, that describe the amount of the trap under water.
+    """
+    tide_values = np.asarray(tide_values, dtype=float).ravel()
+    return get_coverage_lookup(perimeter, radius, delta)[get_first_underwater_index(tide_values, perimeter[2])]
+
+def _chord_coverage(x, y_shift, two_r_sq):
+    """Ratio of the trap under water when the point at (x, y_shift) from the center of the trap is the first one under water"""
+    length_sq = x * x + y_shift * y_shift
+    return np.arccos((two_r_sq - length_sq) / two_r_sq) * inv_half_pi
+
+if has_numba:
+    # compiled as a ufunc, without numba the numpy version above already works on arrays
+    _chord_coverage = vectorize(['float64(float64, float64, float64)'], cache=True)(_chord_coverage)
+
+def get_coverage_lookup(perimeter, radius= default_radius, delta= default_delta):
+    """Computes the ratio of the trap under water for each point of the perimeter being the first one under water
+
+    The ratio only depends on which point is the first one under water, so for any tide level it is
+    get_coverage_lookup(perimeter)[get_first_underwater_index(tide_level, perimeter[2])]
+
+    Args:
+        perimeter: a (3, n) array of (x,y,z) floats descriping the top of the semi-circular trap ordered in increasing x values
+        radius: the radius of the semi-circular trap created
+        delta: how far down the y axis the "center" of the semi-circle is from the origin
+
+    Returns:
+        an array of n + 1 floats in [0,1]. The last one is 0, for when no point is under water.
+    """
+    # keep the angle math in float64 even though the perimeter is stored as float32
+    x = np.asarray(perimeter[0], dtype=np.float64)
+    y = np.asarray(perimeter[1], dtype=np.float64)
+    coverage = _chord_coverage(x, y - radius - delta, 2.0 * radius * radius)
+    return np.append(coverage, 0)
+
+if has_numba:
+    @guvectorize(['void(float64, float64[:], float64[:], float64[:], float64, float64, float64[:])'],
+                 '(),(n),(n),(n),(),()->()', target='parallel', cache=True)
+    def _coverage_kernel(tide_level, x_values, y_values, z_values, radius, delta, coverage):
+        """Compiled ufunc version of get_ratio_of_perimeter_covered. It broadcasts over tide levels and over
+        perimeters, so a (traps, 1, n) stack of perimeters and a series of tide levels give a (traps, hours) result.
+        """
+        coverage[0] = 0.0
+        two_r_sq = 2 * radius * radius
+        for i in range(z_values.shape[0]):
+            if(z_values[i] <= tide_level):
+                length_sq = x_values[i]**2 + (y_values[i] - radius - delta)**2
+                angle = math.acos((two_r_sq - length_sq) / two_r_sq)
+                coverage[0] = angle * inv_half_pi
+                break
+
+@functools.lru_cache(maxsize=1)
+def _get_cupy():
+    """Imports cupy the first time a sweep needs it. Returns None when cupy is not installed or no cuda device
+    can be used, in which case parameter sweeps compute the coverage on the cpu."""
+    try:
+        import cupy as cp
+        # a cupy wheel imports fine without a cuda driver or device, so check one is there before using it
+        if(cp.cuda.runtime.getDeviceCount() == 0):
+            return None
+    except Exception:
+        return None
+    return cp
+
+def get_ratios_sweep(tide_values, perimeters, radii, deltas):
+    """Computes the ratio of the trap under water for many traps and a whole series of tide levels in one go
+
+    Args:
+        tide_values: an array of tide level readings in meters above sea-level
+        perimeters: an array of shape (number of traps, 3, n) holding the perimeter of each trap, as returned by get_perimeter
+        radii: the radius of each trap
+        deltas: how far down the y axis the "center" of the semi-circle is from the origin for each trap
+
+    Returns:
+        an array of shape (number of traps, number of tide levels) of floats in [0,1].
+        The coverage is computed on the gpu when cupy is installed and a cuda device is available,
+        otherwise on the cpu, in parallel when numba is available.
+    """
+    cp = _get_cupy()
+    if cp is None and has_numba:
+        perimeters = np.asarray(perimeters, dtype=np.float64)[:, None, :, :]
+        radii = np.asarray(radii, dtype=np.float64)[:, None]
+        deltas = np.asarray(deltas, dtype=np.float64)[:, None]
+        return _coverage_kernel(np.asarray(tide_values, dtype=np.float64).ravel(),
+                                perimeters[:, :, 0], perimeters[:, :, 1], perimeters[:, :, 2], radii, deltas)
+    elif cp is None:
+        return np.array([get_ratios_vectorized(tide_values, perimeters[p], radii[p], deltas[p])
+                         for p in range(len(perimeters))]).reshape(len(perimeters), -1)
+
+    tide_values = cp.asarray(tide_values, dtype=cp.float64).ravel()
+    perimeters = cp.asarray(perimeters, dtype=cp.float64)
+    radii = cp.asarray(radii, dtype=cp.float64)[:, None]
+    deltas = cp.asarray(deltas, dtype=cp.float64)[:, None]
+    x_values = perimeters[:, 0]
+    y_values = perimeters[:, 1]
+    z_values = perimeters[:, 2]
+
+    # one entry per trap, tide level and point on the perimeter
+    underwater = z_values[:, None, :] <= tide_values[None, :, None]
+    index = underwater.argmax(axis=2)
+    any_underwater = underwater.any(axis=2)
+
+    x = cp.take_along_axis(x_values, index, axis=1)
+    y = cp.take_along_axis(y_values, index, axis=1)
+    # only the squared chord length is needed, so no square root is taken
+    length_sq = x * x + (y - radii - deltas)**2
+    two_r_sq = 2 * radii * radii
+    angle = cp.arccos((two_r_sq - length_sq) / two_r_sq)
+    return cp.asnumpy(cp.where(any_underwater, angle * inv_half_pi, 0))
+
 def get_perimeter(radius= default_radius, height= default_height, delta= default_delta, slope= default_slope, intercept= default_inter):
     """Creates set of points at the top of the semi-circular trap
 
@@ -152,20 +360,28 @@ def get_perimeter(radius= default_radius, height= default_height, delta= default
         intercept: using mean sea level as zero, the intercept for the equation of the slope of the beac
     
     returns:
-        the Perimter, a 2d array:
+        the Perimter, a read-only contiguous float32 array of shape (3, 100):
             [0]: x values
             [1]: y values
             [2]: z values
+        The perimeter is cached for each set of inputs, copy it before modifying it.
     """
-    
-    theta = np.linspace(0, np.pi, 100)
+
+    return _get_perimeter_cached(float(radius), float(height), float(delta), float(slope), float(intercept))
+
+@functools.lru_cache(maxsize=32)
+def _get_perimeter_cached(radius, height, delta, slope, intercept):
+    """Computes the perimeter for get_perimeter. The result is cached so notebooks rerunning the same trap reuse it."""
+
     #equation for a circle
-    x = radius * np.cos(theta)
-    y = radius * np.sin(theta) + delta
+    x = radius * _cos_theta
+    y = radius * _sin_theta + delta
     # equation for a line
     z = intercept + height - (slope * y)
 
-    return [x,y,z]
+    perimeter = np.stack((x, y, z)).astype(np.float32, copy=False)
+    perimeter.setflags(write=False)
+    return perimeter
 
 def run_trap_harvesting(prev_values = [], selected_harvest= 0, radius= default_radius, height= default_height, slope= default_slope, delta= default_delta, constant_population= True):
     """Runs the model for one harvesting cycle. Where a harvesting cycle is period of time ending in the next low tide in which the trap is closed with fish inside.
@@ -197,143 +413,374 @@ def run_trap_harvesting(prev_values = [], selected_harvest= 0, radius= default_r
         ValueError if harvesting is not a positive integer <= the number of the fish in the trap
     """
 
-    movement_rate = 0.025
-    max_fish = 1000
-    perimeter_ratio = (np.pi * radius) / (np.pi * 25)
-    tide_values = get_tide_values()
-    perimeter = get_perimeter(radius, height, delta, slope)
-    height_adjustment =1 /  min(1, height / 4)
+    simulation = TrapSimulation(radius, height, slope, delta, constant_population)
 #TODO
 #if allowing users to input arbitrary values check that all the user inputs are within reasonable bounds or throw an error if they are not
-    if(len(prev_values) == 0):
-        #if the model is just starting
-        current_free_fish = max_fish
-        current_caught_fish = 0
-        total_harvested = [0]
-        in_trap = [0]
-        out_trap = [max_fish]
-        catches = []
-    
-    else:
-        #update the model with the harvest the user selected
-        total_harvested = prev_values[0]
-        in_trap = prev_values[1]
-        out_trap = prev_values[2]
-        catches = prev_values[3]
-        current_free_fish = out_trap[-1]
-        current_caught_fish = in_trap[-1]
-    
-        try:
-            selected_harvest = int(selected_harvest)
-        except ValueError:
-            raise ValueError("selected_harvest must be a positive integer not larger than the number of fish in the trap")
-
-        if(selected_harvest > current_caught_fish or selected_harvest < 0):
-            raise ValueError("selected_harvest must be a positive integer not larger than the number of fish in the trap")
+    if(len(prev_values) != 0):
+        #copy the history of the model then update it with the harvest the user selected
+        simulation.set_history(prev_values)
 
-        catches.append(selected_harvest)
-
-        level = tide_values[len(in_trap) - 1]
-        coverage = get_ratio_of_perimeter_covered(level, perimeter, radius)
-        free_to_caught = current_free_fish * coverage * movement_rate * perimeter_ratio
-        caught_to_free = current_caught_fish * coverage * movement_rate * perimeter_ratio * height_adjustment
-        current_caught_fish = current_caught_fish - caught_to_free + free_to_caught
-        current_free_fish = current_free_fish + caught_to_free - free_to_caught
-
-        if(constant_population):
-            current_free_fish = max_fish
-        else:
-            current_free_fish = current_free_fish + (current_caught_fish - selected_harvest)
+    return simulation.step_until_next_low_tide(selected_harvest)
 
-        total_harvested.append(total_harvested[-1] + selected_harvest)
-        #empty the traps and record the step after the selected harvest
-        current_caught_fish = 0
-        in_trap.append(current_caught_fish)
-        out_trap.append(current_free_fish)
 
-    #drop tide values already ran
-    tide_values = tide_values[len(in_trap) - 1 : len(tide_values)]
+class TrapSimulation:
+    """Runs the model one harvesting cycle at a time, keeping its state between cycles.
 
-    for level in tide_values:
-        coverage = get_ratio_of_perimeter_covered(level, perimeter, radius)
-        
-        if(math.floor(current_caught_fish) != 0 and coverage == 0):
-            return [total_harvested, in_trap, out_trap, catches, False]
-        
-        free_to_caught = current_free_fish * coverage * movement_rate * perimeter_ratio
-        caught_to_free = current_caught_fish * coverage * movement_rate * perimeter_ratio
-        current_caught_fish = current_caught_fish - caught_to_free + free_to_caught
-        current_free_fish = current_free_fish + caught_to_free - free_to_caught
-        
-        total_harvested.append(total_harvested[-1])
-        in_trap.append(current_caught_fish)
-        out_trap.append(current_free_fish)
-   
-    return [total_harvested, in_trap, out_trap, catches, True]
+    The tide values, the perimeter and the coverage of the trap are computed once, and the history of the model
+    is kept in preallocated arrays with a cursor on the last hour recorded, so each harvest only runs the hours
+    after the previous one.
 
+    Each hour the trap is under water, coverage * k_in * (free fish - caught fish) fish move into the trap, so fish
+    leave at the same rate they enter. Only the hour right after a harvest uses k_out for the fish leaving the trap.
 
-def run_trap(radius= default_radius, height= default_height, slope= default_slope, delta= default_delta, constant_population= True):
-    """Runs the fish trap model for 1 week.
-    
     Args:
         radius: the radius of the semi-circular trap created
         height: the height of the trap
         slope: slope of the beach
         delta: how far down the y axis the "center" of the semi-circle is from the origin
         constant_population: if true the population will reset to max_fish after every harvest, else it will decrease by the number of harvested fish
+    """
+    movement_rate = 0.025
+
+    def __init__(self, radius= default_radius, height= default_height, slope= default_slope, delta= default_delta, constant_population= True):
+        perimeter_ratio = radius / 25.0
+        self.tide = get_tide_values()
+        self.perimeter = get_perimeter(radius, height, delta, slope)
+        self.coverage = get_ratios_vectorized(self.tide, self.perimeter, radius, delta)
+        # hours where the trap is out of the water, found once for the whole series
+        self.low_tide = self.coverage == 0
+        height_adjustment =1 /  min(1, height / 4)
+        # rates at which fish move into and out of the trap when it is fully under water
+        self.k_in = perimeter_ratio * self.movement_rate
+        self.k_out = self.k_in * height_adjustment
+        self.constant_population = constant_population
+
+        n = len(self.coverage)
+        # harvests are whole fish, so the running total is kept as integers
+        self.total_harvested = np.empty(n + 1, dtype=np.int64)
+        self.in_trap = np.empty(n + 1)
+        self.out_trap = np.empty(n + 1)
+        self.total_harvested[0] = 0
+        self.in_trap[0] = 0
+        self.out_trap[0] = max_fish
+        self.catches = []
+        #index of the last hour recorded
+        self.cursor = 0
+        self.done = False
+
+    def set_history(self, prev_values):
+        """Replaces the history of the model with one returned by run_trap_harvesting, moving the cursor to its last hour."""
+        t = len(prev_values[1]) - 1
+        self.total_harvested[:t + 1] = prev_values[0]
+        self.in_trap[:t + 1] = prev_values[1]
+        self.out_trap[:t + 1] = prev_values[2]
+        self.catches = prev_values[3]
+        self.cursor = t
+
+    def get_values(self):
+        """Returns the history of the model in the same format as run_trap_harvesting."""
+        t = self.cursor
+        return [self.total_harvested[:t + 1], self.in_trap[:t + 1], self.out_trap[:t + 1], self.catches, self.done]
+
+    def step_until_next_low_tide(self, selected_harvest= 0):
+        """Harvests the trap then runs the model from the cursor until the next low tide with fish in the trap.
+
+        Args:
+            selected_harvest: how many fish will be harvested this cycle, ignored when the model is just starting
+
+        Returns:
+            The history of the model, in the same format as run_trap_harvesting
+
+        Throws:
+            ValueError if harvesting is not a positive integer <= the number of the fish in the trap
+        """
+        if(self.done):
+            return self.get_values()
+
+        t = self.cursor
+        n = len(self.coverage)
+        coverage_values = self.coverage
+        low_tide = self.low_tide
+        k_in = self.k_in
+        k_out = self.k_out
+        total_harvested = self.total_harvested
+        in_trap = self.in_trap
+        out_trap = self.out_trap
+        current_free_fish = out_trap[t]
+        current_caught_fish = in_trap[t]
+
+        if(t != 0):
+            #update the history with the harvest the user selected
+            try:
+                selected_harvest = int(selected_harvest)
+            except ValueError:
+                raise ValueError("selected_harvest must be a positive integer not larger than the number of fish in the trap")
+
+            if(selected_harvest > current_caught_fish or selected_harvest < 0):
+                raise ValueError("selected_harvest must be a positive integer not larger than the number of fish in the trap")
+
+            self.catches.append(selected_harvest)
+
+            coverage = coverage_values[t]
+            net_flux = coverage * (k_in * current_free_fish - k_out * current_caught_fish)
+            current_caught_fish += net_flux
+            current_free_fish -= net_flux
+
+            if(self.constant_population):
+                current_free_fish = max_fish
+            else:
+                current_free_fish = current_free_fish + (current_caught_fish - selected_harvest)
+
+            total_harvested[t + 1] = total_harvested[t] + selected_harvest
+            #empty the traps and record the step after the selected harvest
+            current_caught_fish = 0
+            in_trap[t + 1] = current_caught_fish
+            out_trap[t + 1] = current_free_fish
+            t += 1
+
+        #continue from the cursor
+        start = t
+        for t in range(start, n):
+            if(low_tide[t]):
+                # stop when there is at least one whole fish to harvest, the fish in the trap are never negative
+                if(current_caught_fish >= 1.0):
+                    self.cursor = t
+                    return self.get_values()
+                #no fish move while the trap is out of the water
+            else:
+                net_flux = coverage_values[t] * k_in * (current_free_fish - current_caught_fish)
+                current_caught_fish += net_flux
+                current_free_fish -= net_flux
+
+            total_harvested[t + 1] = total_harvested[t]
+            in_trap[t + 1] = current_caught_fish
+            out_trap[t + 1] = current_free_fish
+
+        self.cursor = n
+        self.done = True
+        return self.get_values()
+
+
+@njit(fastmath=True, cache=True)
+def _run_trap_core(coverage_values, k_in, k_out, max_fish, constant_population):
+    """Runs the hourly loop of the fish trap model, compiled with numba when it is available.
+
+    Each hour the trap is under water, coverage * (k_in * free fish - k_out * caught fish) fish move into the trap,
+    a negative value meaning fish move out of it.
+
+    Args:
+        coverage_values: an array with the ratio of the trap under water for each hour
+        k_in: the ratio of fish outside the trap that move into it each hour when it is fully under water
+        k_out: the ratio of fish inside the trap that move out of it each hour when it is fully under water
+        max_fish: the number of fish in the area at the start of the model
+        constant_population: if true the population will reset to max_fish after every harvest, else it will decrease by the number of harvested fish
 
     Returns:
-        An 2d array containing:
+        A tuple of arrays containing:
             [0]: The total number of harvested fish at hour indexed
             [1]: The total number of fish in the trap at hour at hour indexed
             [2]: the total number of fish outside the trap at hour indexed
-            [3]: list of the size of all harvests
+            [3]: the size of all harvests
     """
-    movement_rate = 0.025
+    n = len(coverage_values)
+    # harvests are whole fish, so the running total is kept as integers
+    total_harvested = np.empty(n + 1, dtype=np.int64)
+    in_trap = np.empty(n + 1)
+    out_trap = np.empty(n + 1)
+    catches = np.empty(n, dtype=np.int64)
+    n_catches = 0
+
     current_free_fish = max_fish
-    current_caught_fish = 0
-    total_harvested = [0]
-    in_trap = [0]
-    out_trap = [max_fish]
-    catches = []
-    perimeter_ratio = (np.pi * radius) / (np.pi * 25)
-    height_adjustment = 1 / min(1, height / 4)
-    tide_values = get_tide_values()
-    perimeter = get_perimeter(radius, height, delta, slope)
-    
+    current_caught_fish = 0.0
+    total_harvested[0] = 0
+    in_trap[0] = 0
+    out_trap[0] = max_fish
+
     #iterated through all tide levels recorded and run the model
-    for level in tide_values:
-        coverage = get_ratio_of_perimeter_covered(level, perimeter, radius)
-        free_to_caught = current_free_fish * coverage * movement_rate * perimeter_ratio
-        caught_to_free = current_caught_fish * coverage * movement_rate * perimeter_ratio * height_adjustment
-        current_caught_fish = current_caught_fish - caught_to_free + free_to_caught
-        current_free_fish = current_free_fish + caught_to_free - free_to_caught
-        
+    for t in range(n):
+        coverage = coverage_values[t]
+
         #if the coverage is >0 then the fish arn't trapped so "nothing" happens
         if(coverage > 0):
-            total_harvested.append(total_harvested[-1])
-        
+            net_flux = coverage * (k_in * current_free_fish - k_out * current_caught_fish)
+            current_caught_fish += net_flux
+            current_free_fish -= net_flux
+
+            total_harvested[t + 1] = total_harvested[t]
+
+        #the trap is out of the water, no fish move and the ones in the trap are harvested
         else:
             selected_harvest = math.floor(current_caught_fish)
-            
+
             # regardless of if it was automatically selected or user selected we record the harvest level
-            total_harvested.append(total_harvested[-1] + selected_harvest)
-            
-            if(math.floor(current_caught_fish) != 0):
-                catches.append(selected_harvest)
+            total_harvested[t + 1] = total_harvested[t] + selected_harvest
+
+            if(selected_harvest != 0):
+                catches[n_catches] = selected_harvest
+                n_catches += 1
 
-            if(constant_population == True):
+            if(constant_population):
                 current_free_fish = max_fish
             else:
                 current_free_fish = current_free_fish + (current_caught_fish - selected_harvest)
-            
+
             # clear the traps
-            current_caught_fish = 0
-        
-        in_trap.append(current_caught_fish)
-        out_trap.append(current_free_fish)
+            current_caught_fish = 0.0
+
+        in_trap[t + 1] = current_caught_fish
+        out_trap[t + 1] = current_free_fish
+
+    return total_harvested, in_trap, out_trap, catches[:n_catches]
+
+
+def run_trap(radius= default_radius, height= default_height, slope= default_slope, delta= default_delta, constant_population= True, coverage_values= None):
+    """Runs the fish trap model for 1 week.
+    
+    Args:
+        radius: the radius of the semi-circular trap created
+        height: the height of the trap
+        slope: slope of the beach
+        delta: how far down the y axis the "center" of the semi-circle is from the origin
+        constant_population: if true the population will reset to max_fish after every harvest, else it will decrease by the number of harvested fish
+        coverage_values: the ratio of the trap under water for each hour, as returned by get_ratios_vectorized for this
+            trap and get_tide_values(). Pass it in when running the same trap several times so it is only computed once.
+
+    Returns:
+        An 2d array containing:
+            [0]: The total number of harvested fish at hour indexed
+            [1]: The total number of fish in the trap at hour at hour indexed
+            [2]: the total number of fish outside the trap at hour indexed
+            [3]: list of the size of all harvests
+    """
+    movement_rate = 0.025
+    perimeter_ratio = radius / 25.0
+    height_adjustment = 1 / min(1, height / 4)
+    if(coverage_values is None):
+        tide_values = get_tide_values()
+        perimeter = get_perimeter(radius, height, delta, slope)
+        coverage_values = get_ratios_vectorized(tide_values, perimeter, radius, delta)
+    else:
+        coverage_values = np.asarray(coverage_values, dtype=np.float64)
+
+    k_in = perimeter_ratio * movement_rate
+    k_out = k_in * height_adjustment
+
+    total_harvested, in_trap, out_trap, catches = _run_trap_core(coverage_values, k_in, k_out,
+                                                                 float(max_fish), bool(constant_population))
+
+    return [total_harvested, in_trap, out_trap, catches.tolist()]
+
+
+@njit(parallel=True, cache=True)
+def _run_trap_sweep_core(coverage_values, k_in, k_out, max_fish, constant_population):
+    """Runs _run_trap_core for every row of coverage_values, in parallel when numba is available.
+
+    Returns:
+        A tuple of 2d arrays with one row per set of trap parameters containing:
+            [0]: The total number of harvested fish at hour indexed
+            [1]: The total number of fish in the trap at hour at hour indexed
+            [2]: the total number of fish outside the trap at hour indexed
+    """
+    n_params, n_hours = coverage_values.shape
+    total_harvested = np.empty((n_params, n_hours + 1), dtype=np.int64)
+    in_trap = np.empty((n_params, n_hours + 1))
+    out_trap = np.empty((n_params, n_hours + 1))
+
+    for p in prange(n_params):
+        harvested_p, in_trap_p, out_trap_p, catches_p = _run_trap_core(coverage_values[p], k_in[p], k_out[p],
+                                                                       max_fish, constant_population)
+        total_harvested[p, :] = harvested_p
+        in_trap[p, :] = in_trap_p
+        out_trap[p, :] = out_trap_p
+
+    return total_harvested, in_trap, out_trap
+
+def _run_trap_sweep_vectorized(coverage_values, k_in, k_out, max_fish, constant_population):
+    """Same as _run_trap_sweep_core, but steps through the hours with every trap updated at once as an array.
+    Used for sweeps when numba is not available, the fish movement is evaluated with numexpr if it is installed.
+    """
+    n_params, n_hours = coverage_values.shape
+    total_harvested = np.empty((n_params, n_hours + 1), dtype=np.int64)
+    in_trap = np.empty((n_params, n_hours + 1))
+    out_trap = np.empty((n_params, n_hours + 1))
+
+    current_free_fish = np.full(n_params, max_fish)
+    current_caught_fish = np.zeros(n_params)
+    total_harvested[:, 0] = 0
+    in_trap[:, 0] = 0
+    out_trap[:, 0] = max_fish
+    # traps that are out of the water, for every trap and hour at once
+    low_tide_values = coverage_values <= 0
+
+    for t in range(n_hours):
+        coverage = coverage_values[:, t]
+        if ne is not None:
+            net_flux = ne.evaluate("coverage * (k_in * current_free_fish - k_out * current_caught_fish)")
+        else:
+            net_flux = coverage * (k_in * current_free_fish - k_out * current_caught_fish)
+        current_caught_fish = current_caught_fish + net_flux
+        current_free_fish = current_free_fish - net_flux
+
+        # traps that are out of the water are harvested
+        low_tide = low_tide_values[:, t]
+        selected_harvest = np.where(low_tide, np.floor(current_caught_fish), 0)
+        total_harvested[:, t + 1] = total_harvested[:, t] + selected_harvest
+
+        if(constant_population):
+            current_free_fish = np.where(low_tide, max_fish, current_free_fish)
+        else:
+            current_free_fish = current_free_fish + (np.where(low_tide, current_caught_fish, 0) - selected_harvest)
+
+        # clear the traps
+        current_caught_fish = np.where(low_tide, 0, current_caught_fish)
+
+        in_trap[:, t + 1] = current_caught_fish
+        out_trap[:, t + 1] = current_free_fish
+
+    return total_harvested, in_trap, out_trap
+
+def run_trap_sweep(radii, heights, slopes, deltas, constant_population= True):
+    """Runs the fish trap model for 1 week for many traps at once, for example to explore a grid of trap parameters.
+
+    Args:
+        radii: the radius of each trap
+        heights: the height of each trap
+        slopes: the slope of the beach for each trap
+        deltas: how far down the y axis the "center" of the semi-circle is from the origin for each trap
+        constant_population: if true the population will reset to max_fish after every harvest, else it will decrease by the number of harvested fish
+        The parameters are broadcast against each other, so a single value is used for every trap and
+        arrays from np.meshgrid give every combination of the grid, flattened in C order.
+
+    Returns:
+        A list of 2d arrays, each with one row per trap, containing:
+            [0]: The total number of harvested fish at hour indexed
+            [1]: The total number of fish in the trap at hour at hour indexed
+            [2]: the total number of fish outside the trap at hour indexed
+
+    Raises: ValueError if the parameter arrays can not be broadcast together
+    """
+    try:
+        radii, heights, slopes, deltas = np.broadcast_arrays(*(np.asarray(values, dtype=float)
+                                                               for values in (radii, heights, slopes, deltas)))
+    except ValueError:
+        raise ValueError("radii, heights, slopes and deltas must have the same length or be broadcastable together")
+    radii = radii.ravel()
+    heights = heights.ravel()
+    slopes = slopes.ravel()
+    deltas = deltas.ravel()
 
-    return [total_harvested, in_trap, out_trap, catches]
+    movement_rate = 0.025
+    perimeter_ratios = radii / 25.0
+    height_adjustments = 1 / np.minimum(1, heights / 4)
+    tide_values = get_tide_values()
+    perimeters = np.array([get_perimeter(radii[p], heights[p], deltas[p], slopes[p]) for p in range(len(radii))])
+    coverage_values = get_ratios_sweep(tide_values, perimeters, radii, deltas)
+
+    k_in = perimeter_ratios * movement_rate
+    k_out = k_in * height_adjustments
+
+    sweep = _run_trap_sweep_core if has_numba else _run_trap_sweep_vectorized
+    return list(sweep(coverage_values, k_in, k_out, float(max_fish), bool(constant_population)))
 
 
 def generate_df_from_simulation(fish_simulation):
@@ -349,15 +796,21 @@ def generate_df_from_simulation(fish_simulation):
     
     Usage generate_df_from_simulation(fish_simulation)
     """
-    df = pd.DataFrame(fish_simulation)
-    
-    df.columns=['Total Harvested', 'In Trap', 'Out of Trap']
-    df['hour'] = df.index
-    df['In Area'] = df.apply(lambda x: x['In Trap'] + x['Out of Trap'], axis=1)
-
-    df['day'] = df['hour']//24
-    df['day_hour'] = df['hour']%24
-    df['In Trap'] = df['In Trap'].round()
+    # the harvested total keeps its dtype, it is whole fish
+    total_harvested = np.asarray(fish_simulation["Total harvested fish"])
+    in_trap = np.asarray(fish_simulation["Total fish in the trap"], dtype=np.float64)
+    out_trap = np.asarray(fish_simulation["Total fish outside the trap"], dtype=np.float64)
+    hour = np.arange(len(total_harvested))
+    day, day_hour = np.divmod(hour, 24)
+
+    # build the columns from the arrays directly with their final names
+    df = pd.DataFrame({'Total Harvested': total_harvested,
+                       'In Trap': np.rint(in_trap),
+                       'Out of Trap': out_trap,
+                       'hour': hour,
+                       'In Area': in_trap + out_trap,
+                       'day': day,
+                       'day_hour': day_hour})
     return df
 
 def plot_values(fish_simulation):
@@ -375,12 +828,14 @@ def plot_values(fish_simulation):
     """
     
     df = generate_df_from_simulation(fish_simulation)
+    # round the fish counts before the melt multiplies the rows, In Trap is already rounded
+    rounded_columns = ['Out of Trap', 'Total Harvested', 'In Area']
+    df[rounded_columns] = df[rounded_columns].round()
     # Manipulate DF a bit more
     df = df.melt(id_vars=['hour'], value_vars = ['In Trap', 'Out of Trap', 'Total Harvested', 'In Area'])
-    df['value'] = df['value'].round()
     df = df.rename(columns={"value": "fish", "variable": "category"})
 
-    fig = px.line(df, x='hour', y='fish', color='category', title="Fish Levels Throughout Harvesting")
+    fig = px.line(df, x='hour', y='fish', color='category', title="Fish Levels Throughout Harvesting", render_mode='webgl')
 
     fig.update_traces(hovertemplate=None)
 
@@ -390,7 +845,7 @@ def plot_values(fish_simulation):
                  xaxis = dict(tickvals = (df.hour // 24).unique() * 24,
                               ticktext = (df.hour // 24).unique()))
 
-    return fig
+    return _resample_figure(fig, len(fish_simulation["Total harvested fish"]))
     
 def plot_caught_fish(fish_simulation):
     """Creates a plotly object displaying the fish in the trap
@@ -403,7 +858,7 @@ def plot_caught_fish(fish_simulation):
     
     fig = px.line(df, x="hour", y="In Trap", line_shape='spline')
 
-    fig.update_traces(text= [f'<b>Day</b>: {x}<br><b>Hour</b>: {y}' for x,y in list(zip(df['day'].values, df['day_hour'].values))],
+    fig.update_traces(text= _get_day_hour_text(df['day'].values, df['day_hour'].values),
                             hovertemplate='%{text}<br>%{y:} fish caught')
     fig.update_layout(title='Number of Fish Trapped using circular trap model at Comox Harbour',
                         xaxis_title = 'Time (Days Since Start)',
@@ -413,7 +868,7 @@ def plot_caught_fish(fish_simulation):
     
     return fig
 
-def plot_trap(radius= default_radius, height= default_height, slope= default_slope, delta= default_delta, constant_population= True):
+def plot_trap(radius= default_radius, height= default_height, slope= default_slope, delta= default_delta, constant_population= True, values= None):
     """Generates a plot for the fish trap operating over 1 week
 
     Args:
@@ -422,9 +877,11 @@ def plot_trap(radius= default_radius, height= default_height, slope= default_slo
         slope: the slope of the beach
         delta: how far down the y axis the "center" of the semi-circle is from the origin
         constant_population: if true the population will reset to max_fish after every harvest, else it will decrease by the number of harvested fish
+        values: the output of run_trap for this trap, if the caller already has it. When None the model is run here.
     """
 
-    values = run_trap(radius, height, slope, delta, constant_population)
+    if(values is None):
+        values = run_trap(radius, height, slope, delta, constant_population)
     
     ## Build data structure
     fish_simulation = {"Total harvested fish":values[0],
@@ -518,70 +975,6 @@ def create_tide_plot_grade6(radius= default_radius, height= default_height, delt
 
     return(fig)
 
-def create_3d_trap(radius, height, delta):
-    """Creates a 3D surface plot showing the trap and the beach.
-    Args:
-        radius: the radius of the trap
-        height: the height of the trap
-        delta: how far along the beach the center of radius r circle the semicircular trap could be in
-    returns:
-        plt.figure() object
-        """
-
-    h = height
-    r = radius
-
-    plt3d = plt.figure().gca(projection='3d')
-
-    # create x,y of the beach
-    xx, yy = np.meshgrid(range(-35, 35), range(-25, 45))
-
-    # calculate corresponding z
-    zz = (delta - (0.17 * yy))
-
-    # plot the beach surface
-    beach_surf = plt3d.plot_surface(xx, yy, zz, alpha=0.2, color = 'brown', label = "beach")
-   
-   # tide_surf equations below get the legend to show
-    beach_surf._facecolors2d=beach_surf._facecolors3d
-    beach_surf._edgecolors2d=beach_surf._edgecolors3d
-
-
-    # find data for the points on the trap on top of the beach points
-    theta = np.linspace(0, np.pi, 100)
-    x = r * np.cos(theta)
-    y = r * np.sin(theta) + delta
-    z = delta + h - (0.17 * y)
-    z2 = delta - (0.17 * y)
-    
-    # reformat points for output
-    x = np.array(tuple(zip(x, x)))
-    y = np.array(tuple(zip(y, y)))
-    z = np.array(tuple(zip(z, z2)))
-    
-    # plot the trap
-    trap_surface = plt3d.plot_surface(x,y,z, label='trap')
-    trap_surface._facecolors2d=trap_surface._facecolors3d
-    trap_surface._edgecolors2d=trap_surface._edgecolors3d
-
-    #format legend
-    plt3d.set_xlabel('X')
-    plt3d.set_ylabel('Y')
-    plt3d.set_zlabel('Z')
-    plt3d.set_xlim(-35,35)
-    plt3d.set_ylim(-25,45)
-    plt3d.legend()
-    plt3d.set_title('fish trap')
-
-    #adjust the viewing angle of the plot
-    #DO NOT change notebook to allow dynamic matplotlib (VERY LAGGY)
-    camera_angle = plt3d.azim
-    elev_angle = plt3d.elev
-
-    plt3d.view_init(elev = elev_angle+5, azim = camera_angle+85)
-
-    return(plt3d)
-
 def run_model_grade6(harvesting=True):
     """
         creates widgets allowing user to specify trap parameters then run plotting functions.
@@ -610,21 +1003,18 @@ def run_model_grade6(harvesting=True):
         #loop through model cycle by cycle taking a fixed percentage of fish each cycle
         #this loops is relatively slow but would allow easy modification to allow user to select each harvest individually
         if(harvesting):
-            flag = False
-            current_results = []
+            simulation = TrapSimulation(radius= radius, height= height, slope= slope,
+                                        delta= location, constant_population = False)
             selected_harvest = 0
             
-            while(not flag):
-                current_results = run_trap_harvesting(prev_values = current_results, selected_harvest = selected_harvest,
-                                                      radius= radius, height= height, slope= slope,
-                                                      delta= location, constant_population = False)
+            while(not simulation.done):
+                current_results = simulation.step_until_next_low_tide(selected_harvest)
                 selected_harvest = math.floor(current_results[1][-1] * (harvesting_percent / 100))
-                flag = current_results[4]
 
-                fish_simulation = {"Total harvested fish":current_results[0],
-                                   "Total fish in the trap":current_results[1],
-                                   "Total fish outside the trap":current_results[2]}
-                fig2 = plot_values(fish_simulation)
+            fish_simulation = {"Total harvested fish":current_results[0],
+                               "Total fish in the trap":current_results[1],
+                               "Total fish outside the trap":current_results[2]}
+            fig2 = plot_values(fish_simulation)
         else:
             fig2 = plot_trap(radius, height, slope, location, False)
 
@@ -638,6 +1028,7 @@ def run_model_grade6(harvesting=True):
      
         #show the plots
         plt.show()
+        plt.close(model_3d)
         fig.show()
         fig2.show()
         fig3.show()
@@ -656,6 +1047,8 @@ def run_ui_updated(radius, height, location,harvesting_percent):
     tide_df['hour'] = tide_df.index
     tide_df["day_hour"] = tide_df["hour"] % 24
     tide_df["day"] = tide_df['hour'] // 24
+    # the same hover text is used by every trace showing the week hour by hour
+    hover_text = _get_day_hour_text(tide_df['day'].values, tide_df['day_hour'].values)
     
 
     # Trap 
@@ -668,17 +1061,13 @@ def run_ui_updated(radius, height, location,harvesting_percent):
     harvesting=True
     
     if(harvesting):
-        flag = False
-        current_results = []
+        simulation = TrapSimulation(radius, height, slope, location, False)
         selected_harvest = 0
 
-        while(not flag):
+        while(not simulation.done):
             
-            current_results = run_trap_harvesting(current_results, selected_harvest,
-                                                      radius, height, slope,
-                                                      location, False)
+            current_results = simulation.step_until_next_low_tide(selected_harvest)
             selected_harvest = math.floor(current_results[1][-1] * (harvesting_percent / 100))
-            flag = current_results[4]
 
     # Build DF
     fish_simulation = {"Total harvested fish":current_results[0],
@@ -705,6 +1094,7 @@ def run_ui_updated(radius, height, location,harvesting_percent):
     
     survivor_colors = ['rgb(33, 75, 99)', 'rgb(79, 129, 102)', 'rgb(151, 179, 100)','rgb(175, 49, 35)']
     
+    # the line and marker traces are drawn with webgl (Scattergl), which renders much faster than svg
     fig = make_subplots(rows=1, cols=4,specs=[[{"type": "scatter"},{"type": "scatter"},{"type": "scatter"}, {"type": "pie"}]])
 
     ### TIDE 
@@ -713,16 +1103,15 @@ def run_ui_updated(radius, height, location,harvesting_percent):
 
     
     fig.add_trace(
-        go.Scatter(x=tide_df["hour"], y=tide_df["tide_level"],name="Weekly Tide",
-                   text= [f'<b>Day</b>: {x}<br><b>Hour</b>: {y}' \
-                           for x,y in list(zip(tide_df['day'].values, tide_df['day_hour'].values))],
+        go.Scattergl(x=tide_df["hour"], y=tide_df["tide_level"],name="Weekly Tide",
+                   text= hover_text,
                         hovertemplate='%{text}<br>%{y:}m above sea-level'),
                  row=1, col=1
                  )
     
      # add line to show low point of the trap
     fig.add_trace(
-        go.Scatter(x=df["hour"], y=np.full(len(x), low_point),name='low point of the trap',
+        go.Scattergl(x=df["hour"], y=np.full(len(x), low_point),name='low point of the trap',
                   hovertemplate=' %{y:.3f}m'),
         row=1, col=1
     )
@@ -731,30 +1120,27 @@ def run_ui_updated(radius, height, location,harvesting_percent):
      
         
     fig.add_trace(
-        go.Scatter(x=df["hour"], y=df["In Trap"],mode='markers',name='Fish In Trap',
+        go.Scattergl(x=df["hour"], y=df["In Trap"],mode='markers',name='Fish In Trap',
                    marker_color=survivor_colors[2],
-                  text= [f'<b>Day</b>: {x}<br><b>Hour</b>: {y}' \
-                           for x,y in list(zip(tide_df['day'].values, tide_df['day_hour'].values))],
+                  text= hover_text,
                         hovertemplate='%{text}<br>%{y:} Fish'),
         row=1, col=2
     )
     
     fig.add_trace(
-        go.Scatter(x=df["hour"], y=df["Out of Trap"],mode='markers',name='Fish Out of Trap',
+        go.Scattergl(x=df["hour"], y=df["Out of Trap"],mode='markers',name='Fish Out of Trap',
                    marker_color=survivor_colors[1 ],
-                  text= [f'<b>Day</b>: {x}<br><b>Hour</b>: {y}' \
-                           for x,y in list(zip(tide_df['day'].values, tide_df['day_hour'].values))],
+                  text= hover_text,
                         hovertemplate='%{text}<br>%{y:} Fish'),
         row=1, col=2)
     
     # Cumulative harvested fish
     
     fig.add_trace(
-        go.Scatter(x=df["hour"], y=df["Total Harvested"],mode='lines+markers',
+        go.Scattergl(x=df["hour"], y=df["Total Harvested"],mode='lines+markers',
                    name='(Cumulative) Total Harvested',
                    marker_color=survivor_colors[0],
-                  text= [f'<b>Day</b>: {x}<br><b>Hour</b>: {y}' \
-                           for x,y in list(zip(tide_df['day'].values, tide_df['day_hour'].values))],
+                  text= hover_text,
                         hovertemplate='%{text}<br>%{y:} Fish'),
         row=1, col=3
     )
@@ -783,12 +1169,13 @@ def create_3d_trap(radius, height, delta):
         delta (int): location of trap
 
     Returns:
-        A 3D plot of the trap 
+        A 3D plot of the trap, as a plt.figure() object the caller is responsible for showing and closing
     """ 
     h = height
     r = radius
 
-    plt3d = plt.figure(figsize=(10,10)).gca(projection='3d')
+    fig = plt.figure(figsize=(10,10))
+    plt3d = fig.add_subplot(projection='3d')
 
     # create x,y
     xx, yy = np.meshgrid(range(-35, 35), range(-25, 45))
@@ -805,9 +1192,8 @@ def create_3d_trap(radius, height, delta):
 
 
 
-    theta = np.linspace(0, np.pi, 100)
-    x = r * np.cos(theta)
-    y = r * np.sin(theta) + delta
+    x = r * _cos_theta
+    y = r * _sin_theta + delta
     z = delta + h - (0.17 * y)
     z2 = delta - (0.17 * y)
 
@@ -834,7 +1220,7 @@ def create_3d_trap(radius, height, delta):
 
     plt3d.view_init(elev = elev_angle+5, azim = camera_angle+85)
 
-    return(plt3d)
+    return(fig)
 
 def draw_results(b):
     radius = all_the_widgets[0].value
@@ -845,7 +1231,9 @@ def draw_results(b):
     clear_output()
     display(tab)  ## Have to redraw the widgets
     if beach_flag:
-        create_3d_trap(radius, height, location)
+        model_3d = create_3d_trap(radius, height, location)
+        plt.show()
+        plt.close(model_3d)
     else:
         run_ui_updated(radius, height, location,harvesting_percentage)
 